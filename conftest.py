@@ -0,0 +1,4 @@
+# pupil_labs is a namespace package, so --doctest-modules imports this module a
+# second time as `real_time_screen_gaze.gaze_mapper`, and surface_tracker refuses
+# to register the _CoreMarker surface version twice
+collect_ignore = ["src/pupil_labs/real_time_screen_gaze/gaze_mapper.py"]
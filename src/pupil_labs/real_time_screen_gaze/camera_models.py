@@ -10,6 +10,57 @@ if sys.version_info < (3, 8):
 else:
     from typing import TypedDict
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _undistort_kernel(pts, fx, fy, cx, cy, k1, k2, p1, p2, k3, k4, k5, k6, out):
+    """
+    Inverts the rational Brown-Conrady model with fixed-point iterations, matching
+    the 5 iterations cv2.undistortPoints performs by default, and re-projects the
+    result onto the image plane without distortion.
+    :param pts: Distorted image points, shape: Nx2
+    :param out: Undistorted image points, shape: Nx2
+    """
+    for i in range(pts.shape[0]):
+        x0 = (pts[i, 0] - cx) / fx
+        y0 = (pts[i, 1] - cy) / fy
+        x = x0
+        y = y0
+        for _ in range(5):
+            r2 = x * x + y * y
+            icdist = (1.0 + ((k6 * r2 + k5) * r2 + k4) * r2) / (
+                1.0 + ((k3 * r2 + k2) * r2 + k1) * r2
+            )
+            if icdist < 0:
+                x = x0
+                y = y0
+                break
+            delta_x = 2.0 * p1 * x * y + p2 * (r2 + 2.0 * x * x)
+            delta_y = p1 * (r2 + 2.0 * y * y) + 2.0 * p2 * x * y
+            x = (x0 - delta_x) * icdist
+            y = (y0 - delta_y) * icdist
+        out[i, 0] = fx * x + cx
+        out[i, 1] = fy * y + cy
+    return out
+
+
+if njit is not None:
+    _undistort_numba = njit(fastmath=True, cache=True)(_undistort_kernel)
+else:
+    _undistort_numba = None
+
+
+# Constant inputs for cv2 calls without pose or distortion, read-only since shared
+_ZERO_RVEC = np.zeros((1, 1, 3), dtype=np.float64)
+_ZERO_RVEC.setflags(write=False)
+_ZERO_TVEC = _ZERO_RVEC
+_ZERO_D = np.zeros((1, 5), dtype=np.float64)
+_ZERO_D.setflags(write=False)
+
+
 class Radial_Dist_Camera():
     def __init__(
         self,
@@ -23,6 +74,17 @@ class Radial_Dist_Camera():
         self.K: npt.NDArray[np.float64] = np.array(K)
         self.D: npt.NDArray[np.float64] = np.array(D)
 
+        # The numba kernel covers the radial, tangential and rational terms only
+        D_flat = self.D.reshape(-1)
+        self._kernel_D: T.Optional[T.Tuple[float, ...]] = None
+        if D_flat.size <= 8 or not D_flat[8:].any():
+            self._kernel_D = tuple(np.pad(D_flat[:8], (0, 8 - min(D_flat.size, 8))))
+
+        # Compiling the kernel takes ~0.4s (less when numba's cache is warm), pay
+        # for it here rather than on the first frame
+        if _undistort_numba is not None and self._kernel_D is not None:
+            self.undistort_points_on_image_plane(np.zeros((1, 2)))
+
     @property
     def focal_length(self) -> float:
         fx = self.K[0, 0]
@@ -32,33 +94,48 @@ class Radial_Dist_Camera():
     def undistort_points_on_image_plane(
         self, points: npt.NDArray[np.float64]
     ) -> npt.NDArray[np.float64]:
-        points = self.unprojectPoints(points, use_distortion=True)
+        if _undistort_numba is not None and self._kernel_D is not None:
+            pts = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 2)
+            out = np.empty_like(pts)
+            fx, fy = self.K[0, 0], self.K[1, 1]
+            cx, cy = self.K[0, 2], self.K[1, 2]
+            undistorted = _undistort_numba(pts, fx, fy, cx, cy, *self._kernel_D, out)
+        else:
+            undistorted = self._undistort_points_cv2(points)
+
+        # Return the same dtype regardless of which implementation was used
+        return np.asarray(undistorted, dtype=np.float64)
+
+    def _undistort_points_cv2(
+        self, points: npt.NDArray[np.float64]
+    ) -> npt.NDArray[np.float64]:
+        points = self.unprojectPoints(points, use_distortion=True, homogeneous=False)
         points = self.projectPoints(points, use_distortion=False)
         return points
 
-    def unprojectPoints(self, pts_2d, use_distortion=True, normalize=False):
+    def unprojectPoints(
+        self, pts_2d, use_distortion=True, normalize=False, homogeneous=True
+    ):
         """
         Undistorts points according to the camera model.
         :param pts_2d, shape: Nx2
+        :param homogeneous: If False, return normalized 2d points without the
+            implicit Z=1 column, shape: Nx2
         :return: Array of unprojected 3d points, shape: Nx3
         """
-        pts_2d = np.array(pts_2d, dtype=np.float32)
-
-        # Delete any posibly wrong 3rd dimension
-        if pts_2d.ndim == 1 or pts_2d.ndim == 3:
-            pts_2d = pts_2d.reshape((-1, 2))
-
-        # Add third dimension the way cv2 wants it
-        if pts_2d.ndim == 2:
-            pts_2d = pts_2d.reshape((-1, 1, 2))
+        # Only copies if the input is not already contiguous float32
+        pts_2d = np.ascontiguousarray(pts_2d, dtype=np.float32).reshape((-1, 1, 2))
 
         if use_distortion:
             _D = self.D
         else:
-            _D = np.asarray([[0.0, 0.0, 0.0, 0.0, 0.0]])
+            _D = _ZERO_D
 
         pts_2d_undist = cv2.undistortPoints(pts_2d, self.K, _D)
 
+        if not homogeneous:
+            return pts_2d_undist.reshape((-1, 2))
+
         pts_3d = cv2.convertPointsToHomogeneous(pts_2d_undist)
         pts_3d.shape = -1, 3
 
@@ -70,7 +147,8 @@ class Radial_Dist_Camera():
     def projectPoints(self, object_points, rvec=None, tvec=None, use_distortion=True):
         """
         Projects a set of points onto the camera plane as defined by the camera model.
-        :param object_points: Set of 3D world points
+        :param object_points: Set of 3D world points, or 2D normalized points with
+            an implicit Z=1
         :param rvec: Set of vectors describing the rotation of the camera when recording
             the corresponding object point
         :param tvec: Set of vectors describing the translation of the camera when
@@ -78,23 +156,45 @@ class Radial_Dist_Camera():
         :return: Projected 2D points
         """
         input_dim = object_points.ndim
-
+        is_normalized = object_points.shape[-1] == 2
+
+        # Identity pose without distortion is a plain pinhole projection
+        if rvec is None and tvec is None and not use_distortion:
+            if is_normalized:
+                image_points = object_points.reshape((-1, 2)) * (
+                    self.K[0, 0],
+                    self.K[1, 1],
+                )
+            else:
+                pts_3d = object_points.reshape((-1, 3))
+                image_points = pts_3d[:, :2] / pts_3d[:, 2:3]
+                image_points *= (self.K[0, 0], self.K[1, 1])
+            image_points += (self.K[0, 2], self.K[1, 2])
+
+            if input_dim == 3:
+                image_points.shape = (-1, 1, 2)
+            return image_points
+
+        if is_normalized:
+            object_points = cv2.convertPointsToHomogeneous(
+                object_points.reshape((-1, 1, 2))
+            )
         object_points = object_points.reshape((1, -1, 3))
 
         if rvec is None:
-            rvec = np.zeros(3).reshape(1, 1, 3)
+            rvec = _ZERO_RVEC
         else:
             rvec = np.array(rvec).reshape(1, 1, 3)
 
         if tvec is None:
-            tvec = np.zeros(3).reshape(1, 1, 3)
+            tvec = _ZERO_TVEC
         else:
             tvec = np.array(tvec).reshape(1, 1, 3)
 
         if use_distortion:
             _D = self.D
         else:
-            _D = np.asarray([[0.0, 0.0, 0.0, 0.0, 0.0]])
+            _D = _ZERO_D
 
         image_points, jacobian = cv2.projectPoints(
             object_points, rvec, tvec, self.K, _D
@@ -1,7 +1,8 @@
+import functools
 import os
 import sys
 import uuid
-from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
 
 import cv2
 import numpy as np
@@ -24,20 +25,41 @@ from surface_tracker.surface import _Surface_V2
 
 from .camera_models import Radial_Dist_Camera
 
+# Number of distinct surface layouts whose registered markers are kept for reuse
+_MAX_CACHED_LAYOUTS = 32
+
+# Number of recent marker configurations whose surface location is kept per surface
+_MAX_CACHED_LOCATIONS = 8
+
+
 class GazeMapper:
     def __init__(
         self,
         calibration,
         surfaces: Iterable[Surface] = (),
+        detect_scale: float = 1.0,
+        nthreads: Optional[int] = None,
+        quad_decimate: Optional[float] = None,
+        decode_sharpening: float = 1.0,
     ) -> None:
         self._camera: Optional[Radial_Dist_Camera]
         self._detector: Optional[ApriltagDetector]
+        self._detector_kwargs = dict(
+            detect_scale=detect_scale,
+            nthreads=nthreads,
+            quad_decimate=quad_decimate,
+            decode_sharpening=decode_sharpening,
+        )
         self._tracker = SurfaceTracker()
 
         self._surfaces: List[Surface] = list(surfaces)
         self._recent_result: Optional[MarkerMapperResult] = None
         self._detected_markers = []
         self._surface_locations = {}
+        self._registered_markers_cache: Dict[tuple, Dict[MarkerId, _CoreMarker]] = {}
+        self._location_caches: Dict[
+            SurfaceId, Dict[tuple, Optional[SurfaceLocation]]
+        ] = {}
 
         self.camera = Radial_Dist_Camera(
             name='Scene',
@@ -54,26 +76,60 @@ class GazeMapper:
         if not self._detector:
             return
 
+        # Detected markers are only used to locate surfaces, skip detection without any
+        if not self._surfaces:
+            self._detected_markers = []
+            self._surface_locations = {}
+            return
+
         if hasattr(frame, 'bgr_pixels'):
             frame = frame.bgr_pixels
 
         elif hasattr(frame, 'bgr_buffer'):
             frame = frame.bgr_buffer()
 
-        self._detected_markers = self._detector.detect_from_image(frame)
+        self._detected_markers = self._detector.detect(frame)
+
+        # Markers barely move while head and screen are still, so identify the frame
+        # by its marker uids and corners quantized to half a pixel
+        quantized_vertices = (
+            np.rint(np.asarray(m.vertices()) * 2).astype(np.int32).tobytes()
+            for m in self._detected_markers
+        )
+        markers_key = tuple(
+            sorted(zip((m.uid for m in self._detected_markers), quantized_vertices))
+        )
 
         self._surface_locations = {
-            surface.uid: self._tracker.locate_surface(
+            surface.uid: self._locate_surface(surface, markers_key)
+            for surface in self._surfaces
+        }
+
+    def _locate_surface(
+        self, surface: Surface, markers_key: tuple
+    ) -> Optional[SurfaceLocation]:
+        cache = self._location_caches.setdefault(surface.uid, {})
+        if markers_key in cache:
+            # Move the hit to the end so the least recently used entry is evicted
+            location = cache.pop(markers_key)
+        else:
+            location = self._tracker.locate_surface(
                 surface=surface,
                 markers=self._detected_markers,
             )
-            for surface in self._surfaces
-        }
+            if len(cache) >= _MAX_CACHED_LOCATIONS:
+                del cache[next(iter(cache))]
+
+        cache[markers_key] = location
+        return location
 
     def process_gaze(self, gaze):
         if len(self._surface_locations) == 0:
             return
 
+        if gaze is None:
+            return MarkerMapperResult(self._detected_markers, self._surface_locations, {})
+
         gaze_undistorted = self._camera.undistort_points_on_image_plane([[gaze[0], gaze[1]]])
 
         gaze_mapped_norm: npt.NDArray[np.float32]
@@ -85,15 +141,21 @@ class GazeMapper:
 
             gaze_mapped_norm = location._map_from_image_to_surface(gaze_undistorted.reshape(1, 2))
 
+            # Test all mapped points against the surface bounds at once
+            on_aoi = ((gaze_mapped_norm >= 0.0) & (gaze_mapped_norm <= 1.0)).all(axis=1)
+
             mapped_gaze[location.surface_uid] = [
-                MarkerMappedGaze.from_norm_pos(surface_uid, norm, base)
-                for base, norm in zip(gaze, gaze_mapped_norm.tolist())
+                MarkerMappedGaze(surface_uid, x, y, is_on_aoi, base)
+                for base, (x, y), is_on_aoi in zip(
+                    gaze, gaze_mapped_norm.tolist(), on_aoi.tolist()
+                )
             ]
 
         return MarkerMapperResult(self._detected_markers, self._surface_locations, mapped_gaze)
 
     def clear_surfaces(self):
         self._surfaces = []
+        self._location_caches = {}
 
     def add_surface(self, markers_verts, surface_size, name='Screen'):
         surface = self._generate_surface(markers_verts, surface_size, name)
@@ -101,6 +163,24 @@ class GazeMapper:
         return surface
 
     def _generate_surface(self, markers_verts, surface_size, name):
+        # Identical layouts are commonly re-added, so reuse their registered markers.
+        # The markers are immutable; each surface gets its own copy of the mapping.
+        layout_key = (
+            tuple(np.atleast_1d(surface_size).tolist()),
+            tuple(
+                (marker_id, tuple(map(tuple, np.asarray(marker_verts).tolist())))
+                for marker_id, marker_verts in sorted(markers_verts.items())
+            ),
+        )
+        registered_markers = self._registered_markers_cache.get(layout_key)
+        if registered_markers is not None:
+            return _Surface_V2(
+                uid=SurfaceId(str(uuid.uuid4())),
+                name=name,
+                registered_markers_undistorted=dict(registered_markers),
+                orientation=SurfaceOrientation(),
+            )
+
         surface = _Surface_V2(
             uid=SurfaceId(str(uuid.uuid4())),
             name=name,
@@ -112,24 +192,31 @@ class GazeMapper:
             verts_norm = np.array(marker_verts) / surface_size
             verts_norm[:,1] = 1 - verts_norm[:,1]
 
+            # Flipping the y-axis turns the clockwise vertices from the top left into
+            # counter-clockwise ones from the bottom left, so reversing them yields
+            # the canonical top left, top right, bottom right, bottom left order
             marker = _CoreMarker(
                 create_apriltag_marker_uid('tag36h11', marker_id),
                 CoordinateSpace.SURFACE_UNDISTORTED,
-                {
-                    CornerId.TOP_LEFT: verts_norm[3],
-                    CornerId.BOTTOM_LEFT: verts_norm[0],
-                    CornerId.TOP_RIGHT: verts_norm[2],
-                    CornerId.BOTTOM_RIGHT: verts_norm[1],
-                }
+                verts_norm[::-1],
             )
             surface._add_marker(marker)
 
+        if len(self._registered_markers_cache) >= _MAX_CACHED_LAYOUTS:
+            # Evict the oldest layout, dicts preserve insertion order
+            oldest_key = next(iter(self._registered_markers_cache))
+            del self._registered_markers_cache[oldest_key]
+        self._registered_markers_cache[layout_key] = dict(
+            surface._registered_markers_by_uid_undistorted
+        )
+
         return surface
 
     def replace_surface(self, surface, new_marker_verts, new_surface_size):
         new_surface = self._generate_surface(new_marker_verts, new_surface_size, surface.name)
         idx = self._surfaces.index(surface)
         self._surfaces[idx] = new_surface
+        self._location_caches.pop(surface.uid, None)
 
         del surface
 
@@ -142,7 +229,7 @@ class GazeMapper:
     @camera.setter
     def camera(self, camera: Optional["Radial_Dist_Camera"]) -> None:
         self._camera = camera
-        self._detector = ApriltagDetector(camera)
+        self._detector = ApriltagDetector(camera, **self._detector_kwargs)
 
     @property
     def surfaces(self) -> Tuple[Surface]:
@@ -170,67 +257,150 @@ class MarkerMapperResult(NamedTuple):
     mapped_gaze: Dict[SurfaceId, List[MarkerMappedGaze]]
 
 
+@functools.lru_cache(maxsize=1024)
 def create_apriltag_marker_uid(tag_family: str, tag_id: int) -> MarkerId:
     # Construct the UID by concatinating the tag family and the tag id
     return MarkerId(f"{tag_family}:{tag_id}")
 
 
+# Number of distinct codes in the tag36h11 family
+TAG36H11_CODE_COUNT = 587
+
+# Corner order in which _CoreMarker stores its vertices, and each corner's index
+_CANONICAL_CORNERS = CornerId.all_corners()
+_CORNER_INDEX = {c: i for i, c in enumerate(_CANONICAL_CORNERS)}
+
+
 class ApriltagDetector:
-    def __init__(self, camera_model: Radial_Dist_Camera):
+    def __init__(
+        self,
+        camera_model: Radial_Dist_Camera,
+        detect_scale: float = 1.0,
+        nthreads: Optional[int] = None,
+        quad_decimate: Optional[float] = None,
+        decode_sharpening: float = 1.0,
+    ):
+        if not 0.0 < detect_scale <= 1.0:
+            raise ValueError(f"detect_scale must be in (0, 1], got {detect_scale}")
+
+        # Detection stops scaling well beyond 4 threads
+        if nthreads is None:
+            nthreads = min(os.cpu_count() or 1, 4)
+
         families = "tag36h11"
         self._camera_model = camera_model
+
+        # Marker UIDs are identical across frames, so build them once per tag id
+        self._marker_uids = tuple(
+            create_apriltag_marker_uid(families, tag_id)
+            for tag_id in range(TAG36H11_CODE_COUNT)
+        )
+        self._detect_scale = detect_scale
+
+        # Downscaling the image and decimating quads overlap, so by default only
+        # decimate when the image is handed to apriltag at full resolution
+        if quad_decimate is None:
+            quad_decimate = 2.0 if detect_scale == 1.0 else 1.0
         self._detector = pupil_apriltags.Detector(
-            families=families, nthreads=2, quad_decimate=2.0, decode_sharpening=1.0
+            families=families,
+            nthreads=nthreads,
+            quad_decimate=quad_decimate,
+            decode_sharpening=decode_sharpening,
         )
+        self._gray_buf: Optional[npt.NDArray[np.uint8]] = None
+        self._small_buf: Optional[npt.NDArray[np.uint8]] = None
+        # Actual (x, y) ratio of the downscaled to the original image size
+        self._small_ratio = (1.0, 1.0)
+
+    def detect(self, image: npt.NDArray[np.uint8]) -> List[Marker]:
+        # Single-channel frames are already gray
+        if image.ndim == 2:
+            return self.detect_from_gray(image)
+
+        # Index instead of reshaping so strided frames are not copied; apriltag
+        # copies the uint8 pixels into its own buffer either way
+        if image.shape[2] == 1:
+            return self.detect_from_gray(image[:, :, 0])
+
+        return self.detect_from_image(image)
 
     def detect_from_image(self, image: npt.NDArray[np.uint8]) -> List[Marker]:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        return self.detect_from_gray(gray)
+        # Reuse the grayscale buffer across frames to avoid a per-frame allocation
+        if self._gray_buf is None or self._gray_buf.shape != image.shape[:2]:
+            self._gray_buf = np.empty(image.shape[:2], dtype=np.uint8)
+
+        cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._gray_buf)
+        return self.detect_from_gray(self._gray_buf)
 
     def detect_from_gray(self, gray: npt.NDArray[np.uint8]) -> List[Marker]:
+        # Shrink the image before detection; apriltag cost scales with pixel count
+        scale = self._detect_scale
+        if scale != 1.0:
+            height, width = gray.shape[:2]
+            small_shape = (round(height * scale), round(width * scale))
+            if self._small_buf is None or self._small_buf.shape != small_shape:
+                self._small_buf = np.empty(small_shape, dtype=np.uint8)
+
+            cv2.resize(
+                gray,
+                small_shape[::-1],
+                dst=self._small_buf,
+                interpolation=cv2.INTER_AREA,
+            )
+            gray = self._small_buf
+
+            # Rounding the size makes the real ratio differ slightly from the scale
+            self._small_ratio = (small_shape[1] / width, small_shape[0] / height)
+
         # Detect apriltag markers from the gray image
         markers = self._detector.detect(gray)
 
-        # Ensure detected markers are unique
+        # Ensure detected markers are unique; duplicates are rare, so only build
+        # the uid mapping when the tag ids collide (single family detector)
         # TODO: Between deplicate markers, pick the one with higher confidence
         uid_fn = self.__apiltag_marker_uid
-        markers = {uid_fn(m): m for m in markers}.values()
+        if len({m.tag_id for m in markers}) == len(markers):
+            uids = [uid_fn(m) for m in markers]
+        else:
+            unique = {uid_fn(m): m for m in markers}
+            uids = list(unique.keys())
+            markers = list(unique.values())
+        if not markers:
+            return []
+
+        # Undistort the corners of all markers in a single batch. The float64 corners
+        # are converted to contiguous float32 once here, which the camera model then
+        # uses without further copies
+        corners = np.array([m.corners for m in markers], dtype=np.float32)
+        if self._detect_scale != 1.0:
+            # Map corners back to the original image resolution
+            corners /= self._small_ratio
+        vertices = self._camera_model.undistort_points_on_image_plane(
+            corners.reshape(-1, 1, 2)
+        )
+        vertices = vertices.reshape(-1, 4, 2)
 
         # Convert apriltag markers into surface tracker markers
-        marker_fn = self.__apriltag_marker_to_surface_marker
-        markers = [marker_fn(m) for m in markers]
+        # TODO: Verify this is correct...
+        starting_with = CornerId.TOP_LEFT
+        clockwise = True
 
-        return markers
+        from_vertices = Marker.from_vertices
+        return [
+            from_vertices(
+                uid=uid,
+                undistorted_image_space_vertices=marker_vertices,
+                starting_with=starting_with,
+                clockwise=clockwise,
+            )
+            for uid, marker_vertices in zip(uids, vertices)
+        ]
 
-    @staticmethod
     def __apiltag_marker_uid(
+        self,
         apriltag_marker: pupil_apriltags.Detection,
     ) -> MarkerId:
-        family = apriltag_marker.tag_family.decode("utf-8")
-        tag_id = int(apriltag_marker.tag_id)
-        return create_apriltag_marker_uid(family, tag_id)
-
-    def __apriltag_marker_to_surface_marker(
-        self, apriltag_marker: pupil_apriltags.Detection
-    ) -> Marker:
-
-        # Construct the surface tracker marker UID
-        uid = ApriltagDetector.__apiltag_marker_uid(apriltag_marker)
-
-        # Extract vertices in the correct format form apriltag marker
-        vertices = [[point] for point in apriltag_marker.corners]
-        vertices = self._camera_model.undistort_points_on_image_plane(vertices)
-
-        # TODO: Verify this is correct...
-        starting_with = CornerId.TOP_LEFT
-        clockwise = True
-
-        return Marker.from_vertices(
-            uid=uid,
-            undistorted_image_space_vertices=vertices,
-            starting_with=starting_with,
-            clockwise=clockwise,
-        )
+        return self._marker_uids[apriltag_marker.tag_id]
 
 
 class _CoreMarker(Surface):
@@ -264,9 +434,11 @@ class _CoreMarker(Surface):
     def coordinate_space(self) -> CoordinateSpace:
         return self.__coordinate_space
 
-    def _vertices_in_order(self, order: List[CornerId]) -> List[Tuple[float, float]]:
-        mapping = self.__vertices_by_corner_id
-        return [mapping[c] for c in order]
+    def _vertices_in_order(self, order: List[CornerId]) -> npt.NDArray[np.float32]:
+        if order == _CANONICAL_CORNERS:
+            return self.__vertices
+
+        return self.__vertices[[_CORNER_INDEX[c] for c in order]]
 
     @staticmethod
     def from_dict(value: dict) -> "Marker":
@@ -283,15 +455,28 @@ class _CoreMarker(Surface):
         return {
             "uid": self.__uid,
             "space": self.__coordinate_space,
-            "vertices": self.__vertices_by_corner_id,
+            "vertices": dict(zip(_CANONICAL_CORNERS, self.__vertices.tolist())),
         }
 
     def __init__(
         self,
         uid: MarkerId,
         coordinate_space: CoordinateSpace,
-        vertices_by_corner_id: Mapping[CornerId, Tuple[float, float]],
+        vertices_by_corner_id: Union[
+            Mapping[CornerId, Tuple[float, float]], npt.ArrayLike
+        ],
     ):
+        """
+        :param vertices_by_corner_id: Vertices keyed by corner, or a 4x2 array of
+            vertices in canonical corner order (see `CornerId.all_corners`)
+        """
+        if isinstance(vertices_by_corner_id, Mapping):
+            vertices_by_corner_id = [
+                vertices_by_corner_id[c] for c in _CANONICAL_CORNERS
+            ]
+
         self.__uid = uid
         self.__coordinate_space = coordinate_space
-        self.__vertices_by_corner_id = vertices_by_corner_id
+        self.__vertices = np.array(vertices_by_corner_id, dtype=np.float32)
+        self.__vertices.shape = (4, 2)
+        self.__vertices.setflags(write=False)
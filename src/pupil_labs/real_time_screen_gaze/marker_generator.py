@@ -1,7 +1,12 @@
+import functools
+
 import cv2
 
 apriltag_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_36h11)
 
+# Markers are usually redrawn with the same parameters, so reuse the images. The
+# returned arrays are shared between callers and therefore read-only.
+@functools.lru_cache(maxsize=256)
 def generate_marker(marker_id, side_pixels=8, flip_x=False, flip_y=False):
 	image_data = apriltag_dict.generateImageMarker(marker_id, side_pixels, 0)
 
@@ -16,4 +21,5 @@ def generate_marker(marker_id, side_pixels=8, flip_x=False, flip_y=False):
 	if flip_code is not None:
 		image_data = cv2.flip(image_data, flip_code)
 
+	image_data.setflags(write=False)
 	return image_data
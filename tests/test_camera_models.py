@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from pupil_labs.real_time_screen_gaze import camera_models
+from pupil_labs.real_time_screen_gaze.camera_models import Radial_Dist_Camera
+
+RESOLUTION = (1600, 1200)
+INSIDE = [(0.0, 0.0), (800.0, 600.0), (123.4, 987.6), (1599.5, 1.5)]
+EDGE = [(1600.0, 1200.0), (0.0, 1200.0), (1600.0, 0.0), (800.0, 1200.0)]
+OUTSIDE = [(-50.0, 1200.0), (-200.0, -200.0), (1700.0, 600.0), (800.0, 1300.0)]
+
+
+@pytest.fixture
+def camera() -> Radial_Dist_Camera:
+    return Radial_Dist_Camera(
+        name="Scene",
+        resolution=RESOLUTION,
+        K=[[890.0, 0.0, 800.0], [0.0, 890.0, 600.0], [0.0, 0.0, 1.0]],
+        D=[-0.13, 0.11, 0.0002, -0.0003, 0.0005, 0.17, 0.01, 0.02],
+    )
+
+
+@pytest.mark.skipif(camera_models._undistort_numba is None, reason="needs numba")
+@pytest.mark.parametrize(
+    "points", [INSIDE, EDGE, OUTSIDE], ids=["inside", "edge", "outside"]
+)
+def test_numba_kernel_matches_cv2(camera, points) -> None:
+    expected = camera._undistort_points_cv2(np.array(points))
+    actual = camera.undistort_points_on_image_plane(np.array(points))
+    np.testing.assert_allclose(actual, expected, atol=1e-3)
+
+
+def test_undistorted_dtype_is_float64(camera) -> None:
+    assert camera.undistort_points_on_image_plane(np.array(INSIDE)).dtype == np.float64
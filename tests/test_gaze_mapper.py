@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from surface_tracker import CoordinateSpace, CornerId
+
+from pupil_labs.real_time_screen_gaze.gaze_mapper import (
+    GazeMapper,
+    _CoreMarker,
+    create_apriltag_marker_uid,
+)
+
+SURFACE_SIZE = (1920, 1080)
+MARKER_VERTS = {
+    0: [(32, 32), (96, 32), (96, 96), (32, 96)],
+    1: [(1800, 960), (1888, 960), (1888, 1048), (1800, 1048)],
+}
+ORDERS = [
+    CornerId.all_corners(),
+    CornerId.all_corners(CornerId.BOTTOM_LEFT, False),
+    [CornerId.BOTTOM_RIGHT, CornerId.TOP_LEFT, CornerId.BOTTOM_LEFT],
+]
+
+
+@pytest.fixture
+def gaze_mapper() -> GazeMapper:
+    calibration = {
+        "scene_camera_matrix": np.array(
+            [[890.0, 0.0, 800.0], [0.0, 890.0, 600.0], [0.0, 0.0, 1.0]]
+        ),
+        "scene_distortion_coefficients": np.zeros(8),
+    }
+    return GazeMapper(calibration)
+
+
+def _expected_vertices(marker_verts):
+    """Vertices by corner as registered before markers stored an ordered array"""
+    verts_norm = np.array(marker_verts) / SURFACE_SIZE
+    verts_norm[:, 1] = 1 - verts_norm[:, 1]
+    return {
+        CornerId.TOP_LEFT: verts_norm[3],
+        CornerId.BOTTOM_LEFT: verts_norm[0],
+        CornerId.TOP_RIGHT: verts_norm[2],
+        CornerId.BOTTOM_RIGHT: verts_norm[1],
+    }
+
+
+@pytest.mark.parametrize("order", ORDERS, ids=["canonical", "ccw", "partial"])
+def test_registered_marker_corners(gaze_mapper, order) -> None:
+    surface = gaze_mapper.add_surface(MARKER_VERTS, SURFACE_SIZE)
+    markers = surface._registered_markers_by_uid_undistorted
+
+    for marker_id, marker_verts in MARKER_VERTS.items():
+        marker = markers[create_apriltag_marker_uid("tag36h11", marker_id)]
+        expected = _expected_vertices(marker_verts)
+        np.testing.assert_allclose(
+            marker._vertices_in_order(order),
+            [expected[c] for c in order],
+            rtol=1e-6,
+        )
+
+
+@pytest.mark.parametrize("order", ORDERS, ids=["canonical", "ccw", "partial"])
+def test_mapping_input_matches_array_input(order) -> None:
+    expected = _expected_vertices(MARKER_VERTS[0])
+    from_mapping = _CoreMarker("uid", CoordinateSpace.SURFACE_UNDISTORTED, expected)
+    from_array = _CoreMarker(
+        "uid",
+        CoordinateSpace.SURFACE_UNDISTORTED,
+        [expected[c] for c in CornerId.all_corners()],
+    )
+
+    np.testing.assert_array_equal(
+        from_mapping._vertices_in_order(order),
+        from_array._vertices_in_order(order),
+    )
+
+
+def test_from_dict_as_dict_round_trip() -> None:
+    verts_uv = [(0.1, 0.2), (0.3, 0.2), (0.3, 0.4), (0.1, 0.4)]
+    marker = _CoreMarker.from_dict({"uid": "uid", "verts_uv": verts_uv})
+
+    serialized = marker.as_dict()
+    assert serialized["uid"] == "uid"
+    assert serialized["space"] == CoordinateSpace.SURFACE_UNDISTORTED
+    assert serialized["vertices"].keys() == set(CornerId)
+    for corner, vertex in zip(CornerId, verts_uv):
+        np.testing.assert_allclose(serialized["vertices"][corner], vertex, rtol=1e-6)
+
+    restored = _CoreMarker(
+        serialized["uid"], serialized["space"], serialized["vertices"]
+    )
+    np.testing.assert_array_equal(
+        restored._vertices_in_order(CornerId.all_corners()),
+        marker._vertices_in_order(CornerId.all_corners()),
+    )
+
+
+def test_from_dict_rejects_missing_corners() -> None:
+    with pytest.raises(ValueError):
+        _CoreMarker.from_dict({"uid": "uid", "verts_uv": [(0.1, 0.2)]})